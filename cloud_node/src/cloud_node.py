@@ -2,171 +2,385 @@
 """
 Main processing flow of the cloud node:
 1. Listen for data from the fog node via TCP (including encoded data and extended performance metrics 'info').
-2. Parse the received data, separate the encoded data and the 'info' dictionary, and convert the info string into a dictionary using ast.literal_eval.
-3. Store each received performance info in a global list and call compute_performance_metrics() to calculate system-level performance metrics.
-4. Based on the aggregated results, execute a feedback control strategy to generate feedback information and return it to the fog node in JSON format.
+2. Parse the received frame ([8-byte header: info length, encoded data length][info][encoded data]), read the 'info' dictionary and decode it using orjson (or json.loads when orjson is not installed); the encoded data is not used by the cloud node and is discarded as it arrives.
+3. Fold each received performance info into running totals kept on the CloudNode and call compute_performance_metrics() to calculate system-level performance metrics.
+4. Based on the aggregated results, execute a feedback control strategy to generate feedback information and return it to the fog node in JSON format,
+   prefixed with its 4-byte length; the fog node keeps its connection open and sends one frame per window.
 5. At the same time, record the computed performance metrics (for example, write them to a log or save to a file) for subsequent data analysis and comparison of multiple schemes.
+   Steps 3 and 5 are coalesced: connections only mark the totals dirty, and a background aggregator recomputes and records the metrics at a fixed cadence; feedback uses the latest snapshot,
+   whose JSON encoding is also built once per snapshot.
+The server runs on a single asyncio event loop (uvloop when available), so the running totals need no locking.
+Connections use a buffered protocol that receives directly into a pool of preallocated buffers instead of allocating per read.
 """
 
+import asyncio
 import socket
 import logging
-import threading
-import ast
 import time
 import json
 import os
+import atexit
+import struct
+import numpy as np
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    Log formatter that renders the date part of %(asctime)s once per second instead of calling
+    time.localtime + time.strftime for every record; milliseconds are still filled in per record.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_date = ""
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_date = time.strftime(datefmt or self.default_time_format, self.converter(second))
+            self._cached_second = second
+        if datefmt:
+            return self._cached_date
+        return self.default_msec_format % (self._cached_date, record.msecs)
 
 # Configure logging
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(CachedTimeFormatter('%(asctime)s [%(levelname)s] [CloudNode] %(message)s'))
 logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] [CloudNode] %(message)s',
-    handlers=[logging.StreamHandler()]
+    level=logging.INFO,
+    handlers=[log_handler]
+)
+logger = logging.getLogger("CloudNode")
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+    logger.warning("Warning: uvloop library is not installed, falling back to the default asyncio event loop")
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("Warning: orjson library is not installed, falling back to the standard json module for parsing")
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers handle both with the same except clause
+json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# Frame header sent by the fog node: (info length, encoded data length), network byte order
+FRAME_HEADER = struct.Struct("!II")
+MAX_INFO_SIZE = 65535
+# Each response is framed as [4-byte length, network byte order][response], since the fog node keeps the connection open
+RESPONSE_HEADER = struct.Struct("!I")
+
+# Receive buffers are allocated once and reused across connections; each holds a header plus the largest info
+RECV_BUFFER_SIZE = FRAME_HEADER.size + MAX_INFO_SIZE
+RECV_BUFFER_POOL_SIZE = 64
+DISCARD_BUFFER_SIZE = 65536
+
+# Performance info fields aggregated by the cloud node, in accumulator column order
+PERFORMANCE_KEYS = (
+    "total_mutual_info",
+    "total_bandwidth",
+    "total_latency",
+    "total_energy",
+    "successful_transmissions",
+    "total_transmissions",
+    "time_steps",
 )
+# Number of most recent records kept for windowed metrics
+RING_SIZE = 1024
 
-# Global list for storing each received performance record (each record is an 'info' dictionary)
-performance_records = []
+# Feedback messages only differ in the aggregated metrics, so the constant part of each branch is serialized once
+LOW_EFFICIENCY_FEEDBACK_PREFIX = b'{"adjust_dt": -1, "message": "Low bandwidth efficiency detected, consider reducing coding degree.", "aggregated_metrics": '
+HIGH_EFFICIENCY_FEEDBACK_PREFIX = b'{"adjust_dt": 1, "message": "Bandwidth efficiency is satisfactory, consider increasing coding degree.", "aggregated_metrics": '
+FEEDBACK_SUFFIX = b"}"
 
-def compute_performance_metrics():
+def build_feedback(metrics):
     """
-    Calculate the following performance metrics based on the accumulated performance_records:
-      1. Bandwidth Utilization Efficiency (η_BW) = (∑ total_mutual_info) / (∑ total_bandwidth)
-      2. Average Transmission Delay (Λ) = (∑ total_latency) / (∑ total_transmissions)
-      3. Total Energy Consumption (E_total) = ∑ total_energy
-      4. Transmission Reliability (R) = (∑ successful_transmissions) / (∑ total_transmissions)
-      5. Throughput (Θ) = (∑ total_mutual_info) / (∑ time_steps)
-    If any denominator is 0, the corresponding metric returns 0.
-    Returns a dictionary containing these metrics.
+    Feedback control strategy: ask the fog node to reduce the coding degree when the aggregated bandwidth
+    utilization efficiency is below 0.5, and to increase it otherwise.
+    Returns the feedback message, including the aggregated metrics, as JSON-encoded bytes.
     """
-    global performance_records
-    if not performance_records:
-        return {}
-
-    total_mutual_info = sum(rec.get("total_mutual_info", 0) for rec in performance_records)
-    total_bandwidth = sum(rec.get("total_bandwidth", 0) for rec in performance_records)
-    total_latency   = sum(rec.get("total_latency", 0) for rec in performance_records)
-    total_energy    = sum(rec.get("total_energy", 0) for rec in performance_records)
-    successful_tx   = sum(rec.get("successful_transmissions", 0) for rec in performance_records)
-    total_tx        = sum(rec.get("total_transmissions", 0) for rec in performance_records)
-    total_time      = sum(rec.get("time_steps", 0) for rec in performance_records)
-
-    eta_bw = total_mutual_info / total_bandwidth if total_bandwidth > 0 else 0
-    avg_latency = total_latency / total_tx if total_tx > 0 else 0
-    reliability = successful_tx / total_tx if total_tx > 0 else 0
-    throughput = total_mutual_info / total_time if total_time > 0 else 0
-
-    metrics = {
-        "bandwidth_utilization_efficiency": eta_bw,
-        "average_latency": avg_latency,
-        "total_energy": total_energy,
-        "transmission_reliability": reliability,
-        "throughput": throughput
-    }
-    return metrics
-
-def record_metrics(metrics):
+    if metrics.get("bandwidth_utilization_efficiency", 0) < 0.5:
+        prefix = LOW_EFFICIENCY_FEEDBACK_PREFIX
+    else:
+        prefix = HIGH_EFFICIENCY_FEEDBACK_PREFIX
+    return prefix + json.dumps(metrics).encode() + FEEDBACK_SUFFIX
+
+class FogConnectionProtocol(asyncio.BufferedProtocol):
     """
-    Record the computed performance metrics to the file 'performance_metrics.log',
-    writing one JSON-formatted record per line.
+    Receive frames from the fog node over a persistent connection.
+    The header and info are received in place into a pooled buffer; the encoded data is received into the
+    node's shared scratch buffer and dropped. Every buffer handed to the transport ends at the current frame's
+    boundary, so a read never spills into the next frame. Once a whole frame has arrived, the length-prefixed
+    feedback is written back and the connection waits for the next frame.
     """
-    filename = "performance_metrics.log"
-    try:
-        with open(filename, "a") as f:
-            f.write(json.dumps(metrics) + "\n")
-        logging.info(f"Recorded performance metrics to {filename}: {metrics}")
-    except Exception as e:
-        logging.error(f"Failed to write performance metrics log: {e}")
+
+    def __init__(self, node):
+        self.node = node
+        self.transport = None
+        self.addr = None
+        self._buf = None
+        self._view = None
+        self._frames = 0
+        self._closing = False
+        self._reset()
+
+    def _reset(self):
+        self._received = 0
+        self._info_end = None
+        self._frame_len = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info("peername")
+        logger.debug("Accepted connection from %s", self.addr)
+        # Disable Nagle so the small feedback reply is not held back waiting for an ACK
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buf = self.node._acquire_recv_buffer()
+        self._view = memoryview(self._buf)
+
+    def get_buffer(self, sizehint):
+        if self._info_end is None:
+            return self._view[self._received:FRAME_HEADER.size]
+        if self._received < self._info_end:
+            return self._view[self._received:self._info_end]
+        return self.node._discard_view[:min(DISCARD_BUFFER_SIZE, self._frame_len - self._received)]
+
+    def buffer_updated(self, nbytes):
+        if self._closing:
+            return
+        self._received += nbytes
+        if self._info_end is None:
+            if self._received < FRAME_HEADER.size:
+                return
+            info_len, encoded_len = FRAME_HEADER.unpack_from(self._buf)
+            if info_len > MAX_INFO_SIZE:
+                logger.error(f"Data format error: info length {info_len} exceeds {MAX_INFO_SIZE} bytes")
+                self._close(b"FormatError")
+                return
+            # Data format: [header][info][encoded data]; only the info is kept
+            self._info_end = FRAME_HEADER.size + info_len
+            self._frame_len = self._info_end + encoded_len
+        if self._received >= self._frame_len:
+            logger.debug("Received %d bytes of data from %s", self._frame_len, self.addr)
+            try:
+                feedback = self.node.handle_frame(self._buf[FRAME_HEADER.size:self._info_end])
+            except Exception as e:
+                logger.error(f"Error handling connection: {e}")
+                self._close(None)
+                return
+            self.transport.write(RESPONSE_HEADER.pack(len(feedback)) + feedback)
+            self._frames += 1
+            self._reset()
+
+    def eof_received(self):
+        if not self._closing:
+            if self._received == 0:
+                if self._frames == 0:
+                    logger.warning(f"Received empty data from {self.addr}")
+            elif self._frame_len is None:
+                logger.error("Data format error: incomplete frame header")
+            else:
+                logger.error(f"Data format error: connection closed after {self._received} of {self._frame_len} bytes")
+            self._closing = True
+        return False
+
+    def connection_lost(self, exc):
+        if exc is not None and not self._closing:
+            logger.error(f"Error handling connection: {exc}")
+        if self._buf is not None:
+            self.node._release_recv_buffer(self._buf)
+            self._buf = None
+            self._view = None
+
+    def _close(self, response):
+        self._closing = True
+        if response:
+            self.transport.write(RESPONSE_HEADER.pack(len(response)) + response)
+        # close() flushes any pending write before closing the socket
+        self.transport.close()
 
 class CloudNode:
-    def __init__(self, listen_ip="0.0.0.0", listen_port=6001):
+    def __init__(self, listen_ip="0.0.0.0", listen_port=6001, metrics_log="performance_metrics.log",
+                 metrics_interval=0.01, flush_interval=0.5):
         self.listen_ip = listen_ip
         self.listen_port = listen_port
-        self.lock = threading.Lock()
+        # Metrics are recomputed by the aggregator task every metrics_interval seconds when dirty
+        self.metrics_interval = metrics_interval
+        self._dirty = False
+        self._last_metrics = {}
+        self._last_feedback = build_feedback(self._last_metrics)
+        # Keep a single buffered handle to the metrics log instead of reopening it per record
+        self.flush_interval = flush_interval
+        self._log_fp = open(metrics_log, "a", buffering=1 << 16)
+        atexit.register(self._close_metrics_log)
+        # Preallocated receive buffers shared by all connections, plus a scratch area for discarded bytes
+        self._recv_buffers = [bytearray(RECV_BUFFER_SIZE) for _ in range(RECV_BUFFER_POOL_SIZE)]
+        self._discard_view = memoryview(bytearray(DISCARD_BUFFER_SIZE))
+        # Running totals of the received performance info (one column per PERFORMANCE_KEYS entry), updated
+        # in O(1) per record, plus a ring buffer of the last RING_SIZE records for windowed metrics.
+        # They are only read and written on the event loop thread (connection handlers and the
+        # aggregator task), so the hot path needs no lock; readers use the _last_metrics snapshot.
+        self._num_records = 0
+        self._totals = np.zeros(len(PERFORMANCE_KEYS), dtype=np.float64)
+        self._ring = np.zeros((RING_SIZE, len(PERFORMANCE_KEYS)), dtype=np.float64)
 
-    def handle_connection(self, client_sock, addr):
+    def compute_performance_metrics(self, recent=False):
         """
-        Handle each TCP connection:
-         - Receive data, parse the encoded data and the info string.
-         - Record the performance info to the global list and call compute_performance_metrics() to calculate system-level metrics.
-         - Generate feedback control information and return it to the fog node in JSON format.
+        Calculate the following performance metrics based on the running totals of all received records
+        (or, if recent is True, of the last RING_SIZE records only):
+          1. Bandwidth Utilization Efficiency (η_BW) = (∑ total_mutual_info) / (∑ total_bandwidth)
+          2. Average Transmission Delay (Λ) = (∑ total_latency) / (∑ total_transmissions)
+          3. Total Energy Consumption (E_total) = ∑ total_energy
+          4. Transmission Reliability (R) = (∑ successful_transmissions) / (∑ total_transmissions)
+          5. Throughput (Θ) = (∑ total_mutual_info) / (∑ time_steps)
+        If any denominator is 0, the corresponding metric returns 0.
+        Returns a dictionary containing these metrics.
+        """
+        if not self._num_records:
+            return {}
+
+        if recent:
+            totals = self._ring[:min(self._num_records, RING_SIZE)].sum(axis=0)
+        else:
+            totals = self._totals
+        mutual_info, bandwidth, latency, energy, successful_tx, total_tx, time_steps = totals.tolist()
+
+        eta_bw = mutual_info / bandwidth if bandwidth > 0 else 0
+        avg_latency = latency / total_tx if total_tx > 0 else 0
+        reliability = successful_tx / total_tx if total_tx > 0 else 0
+        throughput = mutual_info / time_steps if time_steps > 0 else 0
+
+        metrics = {
+            "bandwidth_utilization_efficiency": eta_bw,
+            "average_latency": avg_latency,
+            "total_energy": energy,
+            "transmission_reliability": reliability,
+            "throughput": throughput
+        }
+        return metrics
+
+    def record_metrics(self, metrics):
+        """
+        Append the computed performance metrics to the metrics log ('performance_metrics.log' by default),
+        writing one JSON-formatted record per line. The write only goes to the buffered handle;
+        it reaches the file when the periodic flusher runs or the node exits.
         """
         try:
-            data = client_sock.recv(65535)
-            if not data:
-                logging.warning(f"Received empty data from {addr}")
-                client_sock.close()
-                return
-            
-            logging.info(f"Received {len(data)} bytes of data from {addr}")
-            # Data format: Encoded data and info string are separated by b"||"
-            parts = data.split(b"||")
-            if len(parts) < 2:
-                logging.error("Data format error: missing separator '||'")
-                client_sock.sendall(b"FormatError")
-                client_sock.close()
-                return
-            
-            encoded_data = parts[0]
-            info_str = parts[1].decode()
-            try:
-                info = ast.literal_eval(info_str)
-            except Exception as e:
-                logging.error(f"Error parsing info dictionary: {e}")
-                info = {}
-            
-            logging.info(f"Received performance info: {info}")
-            # Record the info into the global performance records list
-            with self.lock:
-                performance_records.append(info)
-            
-            # Calculate the aggregated performance metrics
-            metrics = compute_performance_metrics()
-            logging.info(f"Aggregated performance metrics: {metrics}")
-            # Write the performance metrics to the log file
-            record_metrics(metrics)
-            
-            feedback = {}
-            if metrics.get("bandwidth_utilization_efficiency", 0) < 0.5:
-                feedback["adjust_dt"] = -1
-                feedback["message"] = "Low bandwidth efficiency detected, consider reducing coding degree."
-            else:
-                feedback["adjust_dt"] = 1
-                feedback["message"] = "Bandwidth efficiency is satisfactory, consider increasing coding degree."
-            
-            feedback["aggregated_metrics"] = metrics
-            feedback_str = json.dumps(feedback)
-            logging.info(f"Feedback control information: {feedback_str}")
-            # Send feedback information back to the fog node
-            client_sock.sendall(feedback_str.encode())
+            self._log_fp.write(json.dumps(metrics))
+            self._log_fp.write("\n")
         except Exception as e:
-            logging.error(f"Error handling connection: {e}")
+            logger.error(f"Failed to write performance metrics log: {e}")
+
+    def _flush_metrics_log(self):
+        """
+        Flush the buffered metrics log to disk.
+        """
+        try:
+            if not self._log_fp.closed:
+                self._log_fp.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush performance metrics log: {e}")
+
+    async def _metrics_loop(self):
+        """
+        Background aggregator: every metrics_interval seconds, if new records arrived since the last pass,
+        recompute the metrics snapshot from the running totals and append one line to the metrics log.
+        The buffered log is flushed every flush_interval seconds.
+        """
+        last_flush = time.monotonic()
+        while True:
+            await asyncio.sleep(self.metrics_interval)
+            if self._dirty:
+                metrics = self.compute_performance_metrics()
+                self._last_metrics = metrics
+                self._last_feedback = build_feedback(metrics)
+                self._dirty = False
+                logger.info("Aggregated performance metrics: %s", metrics)
+                self.record_metrics(metrics)
+            now = time.monotonic()
+            if now - last_flush >= self.flush_interval:
+                self._flush_metrics_log()
+                last_flush = now
+
+    def _close_metrics_log(self):
+        if not self._log_fp.closed:
+            self._log_fp.close()
+
+    def _acquire_recv_buffer(self):
+        if self._recv_buffers:
+            return self._recv_buffers.pop()
+        return bytearray(RECV_BUFFER_SIZE)
+
+    def _release_recv_buffer(self, buf):
+        if len(self._recv_buffers) < RECV_BUFFER_POOL_SIZE:
+            self._recv_buffers.append(buf)
+
+    def handle_frame(self, info_buf):
+        """
+        Handle one frame received from the fog node:
+         - Parse the info string.
+         - Fold the performance info into the running totals and mark them dirty for the aggregator task.
+         - Generate feedback control information and return it as JSON-encoded bytes.
+        """
+        try:
+            info = json_loads(info_buf)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"Error parsing info dictionary: {e}")
+            info = {}
+        
+        logger.debug("Received performance info: %s", info)
+        # Update the running totals; feedback is based on the aggregator's latest snapshot
+        row = self._ring[self._num_records % RING_SIZE]
+        row[:] = [info.get(key, 0) for key in PERFORMANCE_KEYS]
+        self._totals += row
+        self._num_records += 1
+        self._dirty = True
+        feedback_bytes = self._last_feedback
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Feedback control information: %s", feedback_bytes.decode())
+        return feedback_bytes
+
+    async def serve(self):
+        """
+        Start the asyncio TCP server and the metrics aggregator task, then serve connections forever.
+        """
+        # SO_REUSEPORT (where supported) lets several cloud node processes share the listening port
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: FogConnectionProtocol(self), self.listen_ip, self.listen_port,
+            reuse_address=True, reuse_port=hasattr(socket, "SO_REUSEPORT")
+        )
+        logger.info(f"TCP server started, listening on {self.listen_ip}:{self.listen_port}")
+        metrics_task = asyncio.create_task(self._metrics_loop())
+        try:
+            async with server:
+                await server.serve_forever()
         finally:
-            client_sock.close()
+            metrics_task.cancel()
 
     def start_server(self):
         """
         Start the TCP server, listen on the specified address and port, and handle each connection.
         """
-        server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server_sock.bind((self.listen_ip, self.listen_port))
-        server_sock.listen(5)
-        logging.info(f"TCP server started, listening on {self.listen_ip}:{self.listen_port}")
-        while True:
-            try:
-                client_sock, addr = server_sock.accept()
-                logging.info(f"Accepted connection from {addr}")
-                thread = threading.Thread(target=self.handle_connection, args=(client_sock, addr))
-                thread.daemon = True
-                thread.start()
-            except Exception as e:
-                logging.error(f"TCP server error: {e}")
+        if UVLOOP_AVAILABLE:
+            uvloop.run(self.serve())
+        else:
+            asyncio.run(self.serve())
 
 def main():
     try:
         cloud_node = CloudNode(listen_ip="0.0.0.0", listen_port=6001)
-        logging.info("Starting cloud node...")
+        logger.info("Starting cloud node...")
         cloud_node.start_server()
     except Exception as e:
-        logging.error(f"Error in cloud node main function: {e}")
+        logger.error(f"Error in cloud node main function: {e}")
 
 if __name__ == "__main__":
     main()
@@ -7,8 +7,24 @@ import seaborn as sns
 def load_performance_data(filename="performance_metrics.log"):
     """
     Load performance metrics data from the log file, where each line is a JSON-formatted record.
+    The file is parsed in one pass by pandas' JSON-lines reader; if that fails (for example a truncated
+    last line), it falls back to parsing line by line and skipping the malformed records.
     Returns a pandas DataFrame.
     """
+    try:
+        df = pd.read_json(filename, lines=True)
+    except ValueError as e:
+        print(f"Failed to parse the file in one pass ({e}), parsing line by line")
+        df = _load_performance_data_by_line(filename)
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        return None
+    if df is None or df.empty:
+        print("No data was read. Please check the file contents.")
+        return None
+    return df
+
+def _load_performance_data_by_line(filename):
     data = []
     try:
         with open(filename, "r") as f:
@@ -20,67 +36,43 @@ def load_performance_data(filename="performance_metrics.log"):
                         data.append(record)
                     except Exception as e:
                         print(f"Failed to parse a line of data: {e}")
-        if not data:
-            print("No data was read. Please check the file contents.")
-            return None
-        df = pd.DataFrame(data)
-        return df
+        return pd.DataFrame(data)
     except Exception as e:
         print(f"Error loading file: {e}")
         return None
 
-def plot_bandwidth_utilization(df):
-    plt.figure(figsize=(10, 6))
-    plt.plot(df.index, df['bandwidth_utilization_efficiency'], marker='o', linestyle='-')
-    plt.title('Bandwidth Utilization Efficiency')
-    plt.xlabel('Time Step')
-    plt.ylabel('Efficiency')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("bandwidth_utilization_efficiency_line.png")
-    plt.show()
+def plot_bandwidth_utilization(ax, df):
+    ax.plot(df.index, df['bandwidth_utilization_efficiency'], marker='o', linestyle='-')
+    ax.set_title('Bandwidth Utilization Efficiency')
+    ax.set_xlabel('Time Step')
+    ax.set_ylabel('Efficiency')
+    ax.grid(True)
 
-def plot_average_latency_violin(df):
-    plt.figure(figsize=(10, 6))
-    sns.violinplot(data=df, y='average_latency')
-    plt.title('Average Latency Violin Plot')
-    plt.ylabel('Average Latency (s)')
-    plt.tight_layout()
-    plt.savefig("average_latency_violin.png")
-    plt.show()
+def plot_average_latency_violin(ax, df):
+    sns.violinplot(data=df, y='average_latency', ax=ax)
+    ax.set_title('Average Latency Violin Plot')
+    ax.set_ylabel('Average Latency (s)')
 
-def plot_total_energy(df):
-    plt.figure(figsize=(10, 6))
-    plt.plot(df.index, df['total_energy'], marker='o', linestyle='-', color='orange')
-    plt.title('Total Energy')
-    plt.xlabel('Time Step')
-    plt.ylabel('Total Energy (J)')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("total_energy_line.png")
-    plt.show()
+def plot_total_energy(ax, df):
+    ax.plot(df.index, df['total_energy'], marker='o', linestyle='-', color='orange')
+    ax.set_title('Total Energy')
+    ax.set_xlabel('Time Step')
+    ax.set_ylabel('Total Energy (J)')
+    ax.grid(True)
 
-def plot_transmission_reliability(df):
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=df.index, y='transmission_reliability', data=df, color='green')
-    plt.title('Transmission Reliability')
-    plt.xlabel('Time Step')
-    plt.ylabel('Reliability')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig("transmission_reliability_bar.png")
-    plt.show()
+def plot_transmission_reliability(ax, df):
+    sns.barplot(x=df.index, y='transmission_reliability', data=df, color='green', ax=ax)
+    ax.set_title('Transmission Reliability')
+    ax.set_xlabel('Time Step')
+    ax.set_ylabel('Reliability')
+    ax.tick_params(axis='x', labelrotation=45)
 
-def plot_throughput(df):
-    plt.figure(figsize=(10, 6))
-    plt.plot(df.index, df['throughput'], marker='o', linestyle='-', color='red')
-    plt.title('Throughput')
-    plt.xlabel('Time Step')
-    plt.ylabel('Throughput (unit)')
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig("throughput_line.png")
-    plt.show()
+def plot_throughput(ax, df):
+    ax.plot(df.index, df['throughput'], marker='o', linestyle='-', color='red')
+    ax.set_title('Throughput')
+    ax.set_xlabel('Time Step')
+    ax.set_ylabel('Throughput (unit)')
+    ax.grid(True)
 
 def main():
     df = load_performance_data("performance_metrics.log")
@@ -90,12 +82,16 @@ def main():
 
     print(df.head())
 
-    # Plot charts for each metric separately
-    plot_bandwidth_utilization(df)
-    plot_average_latency_violin(df)
-    plot_total_energy(df)
-    plot_transmission_reliability(df)
-    plot_throughput(df)
+    # Plot each metric on its own axes of a single figure, so the PNG is rasterized and saved only once
+    fig, axes = plt.subplots(5, 1, figsize=(10, 30))
+    plot_bandwidth_utilization(axes[0], df)
+    plot_average_latency_violin(axes[1], df)
+    plot_total_energy(axes[2], df)
+    plot_transmission_reliability(axes[3], df)
+    plot_throughput(axes[4], df)
+    fig.tight_layout()
+    fig.savefig("all_metrics.png")
+    plt.show()
 
 if __name__ == "__main__":
     main()
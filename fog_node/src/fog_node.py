@@ -1,52 +1,244 @@
 #!/usr/bin/env python3
 """
 Implement the main processing flow of the fog node:
-1. Receive IoT device data packets (via the socket_comm interface).
+1. Receive IoT device data packets (via the socket_comm interface, an asyncio TCP server; full windows are processed on a worker thread).
 2. Use a sliding window to construct a tensor X_t ∈ R^(W x 256 x 3), where each packet's probability distribution (256-dimensional) is first calculated and then replicated three times to form three channels.
-3. Perform Tucker decomposition (HOSVD) on the tensor and calculate the entropy within the window (using the probability distribution of each packet to calculate entropy, then taking the average).
+   Since the three channels are identical (the third mode has rank 1), the tensor is kept in its (W x 256) matrix form.
+3. Perform Tucker decomposition (HOSVD) on the tensor's (W x 256) matrix form, which reduces exactly to a truncated SVD of that matrix, and calculate the entropy within the window (using the probability distribution of each packet to calculate entropy, then taking the average).
 4. Use an AR(3) model to predict the next moment's entropy value (falling back to AR(1) if historical data is insufficient).
 5. Select network coding parameters based on the entropy value (current and predicted): coding scheme Ct and coding degree dt.
 6. Perform network coding on the packets within the window (using XOR coding grouped by dt).
 7. Calculate the priority of each packet (using the packet's entropy and energy consumption, applying gamma1 * entropy - gamma2 * energy, and introducing random perturbation).
 8. Utilize a multi-dimensional 0-1 knapsack algorithm to select the packets to be scheduled under given bandwidth and energy constraints.
 9. In addition to the above processing, calculate key performance indicators: total mutual information, total bandwidth, total delay, total energy consumption, transmission success rate, and window coverage time, etc.
-   Send these pieces of information along with the encoded data to the cloud node via TCP.
+   Send these pieces of information along with the encoded data to the cloud node over a persistent TCP connection, framed as [8-byte header: info length, encoded data length][info][encoded data],
+   with the info serialized by orjson (or json.dumps when orjson is not installed).
 """
 
+import asyncio
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import time
 import math
 import numpy as np
 import logging
-import random
 import traceback
 import sys
 import json
-
-try:
-    import tensorly as tl
-    from tensorly.decomposition import tucker
-    TENSORLY_AVAILABLE = True
-except ImportError:
-    TENSORLY_AVAILABLE = False
-    logging.warning("Warning: tensorly library is not installed, Tucker decomposition functionality will be unavailable")
+import struct
 
 logging.basicConfig(
-    level=logging.DEBUG, 
+    level=logging.INFO, 
     format='%(asctime)s [%(levelname)s] [FogNode] %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout)
     ]
 )
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    logging.warning("Warning: numba library is not installed, the entropy and knapsack kernels will fall back to the NumPy implementation")
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logging.warning("Warning: orjson library is not installed, falling back to the standard json module for serialization")
+
+def json_dumps(obj):
+    """
+    Serialize obj to JSON bytes, with orjson when available (NumPy scalars are serialized natively) or the standard json module otherwise.
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj).encode()
+
+# Frame header for messages to the cloud node: (info length, encoded data length), network byte order
+FRAME_HEADER = struct.Struct("!II")
+
+def randomized_svd(A, rank, rng, oversamples=5, n_iter=2):
+    """
+    Rank-r truncated SVD of the matrix A by a randomized range finder: A is projected onto rank + oversamples
+    random directions, refined with n_iter orthonormalized power iterations, and the small projected matrix is
+    decomposed exactly. Falls back to the full SVD when the sketch would not be smaller than A.
+    Returns U (m, r), S (r,) and Vt (r, n).
+    """
+    k = rank + oversamples
+    if k >= min(A.shape):
+        U, S, Vt = np.linalg.svd(A, full_matrices=False)
+        return U[:, :rank], S[:rank], Vt[:rank]
+    # The test matrix matches A's dtype so a float32 A is not upcast by the first product
+    Q, _ = np.linalg.qr(A @ rng.standard_normal((A.shape[1], k), dtype=A.dtype))
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(A.T @ Q)
+        Q, _ = np.linalg.qr(A @ Q)
+    U, S, Vt = np.linalg.svd(Q.T @ A, full_matrices=False)
+    return (Q @ U)[:, :rank], S[:rank], Vt[:rank]
+
+def knapsack_2d_numpy(values, weights1, weights2, capacity1, capacity2):
+    """
+    Two-dimensional 0-1 knapsack by dynamic programming, vectorized with NumPy.
+    The DP table over (capacity1 + 1, capacity2 + 1) is updated one item at a time with a shift-and-max:
+    taking item i moves every state (c1, c2) to (c1 + w, c2 + e) with value + v.
+    The per-item take decisions needed for backtracking are stored bit-packed along capacity2 (np.packbits),
+    which is an eighth of the memory of a boolean (n, capacity1 + 1, capacity2 + 1) table.
+    Returns the indices of the selected items in increasing order.
+    """
+    n = len(values)
+    DP = np.zeros((capacity1 + 1, capacity2 + 1))
+    keep = np.zeros((n, capacity1 + 1, (capacity2 + 8) // 8), dtype=np.uint8)
+    take_plane = np.zeros((capacity1 + 1, capacity2 + 1), dtype=bool)
+    for i in range(n):
+        value, w, e = values[i], weights1[i], weights2[i]
+        if w > capacity1 or e > capacity2:
+            continue
+        candidate = DP[:capacity1 + 1 - w, :capacity2 + 1 - e] + value
+        take = candidate > DP[w:, e:]
+        take_plane[:] = False
+        take_plane[w:, e:] = take
+        keep[i] = np.packbits(take_plane, axis=1)
+        DP[w:, e:] = np.where(take, candidate, DP[w:, e:])
+    selected = []
+    c1 = capacity1
+    c2 = capacity2
+    for i in range(n - 1, -1, -1):
+        # packbits is big-endian within each byte: capacity c2 is bit 7 - c2 % 8 of byte c2 // 8
+        if (keep[i, c1, c2 >> 3] >> (7 - (c2 & 7))) & 1:
+            selected.append(i)
+            c1 -= weights1[i]
+            c2 -= weights2[i]
+    selected.reverse()
+    return np.asarray(selected, dtype=np.int64)
+
+def knapsack_2d_greedy(values, weights1, weights2, capacity1, capacity2):
+    """
+    Greedy approximation of the two-dimensional 0-1 knapsack: take positive-value items in decreasing order
+    of value density (value per capacity-normalized weight) while both capacities allow.
+    Returns the selected indices in increasing order and their total value.
+    """
+    density = values / (weights1 / max(capacity1, 1) + weights2 / max(capacity2, 1) + 1e-12)
+    selected = []
+    used1 = 0
+    used2 = 0
+    for i in np.argsort(-density, kind="stable"):
+        if values[i] <= 0:
+            break
+        if used1 + weights1[i] <= capacity1 and used2 + weights2[i] <= capacity2:
+            selected.append(i)
+            used1 += weights1[i]
+            used2 += weights2[i]
+    selected = np.sort(np.asarray(selected, dtype=np.int64))
+    return selected, float(values[selected].sum())
+
+def knapsack_2d_upper_bound(values, weights1, weights2, capacity1, capacity2):
+    """
+    Upper bound on the optimal two-dimensional knapsack value: the smaller of the fractional (LP relaxation)
+    knapsack bounds obtained by keeping only one of the two capacity constraints.
+    """
+    positive = values > 0
+    return min(
+        _fractional_knapsack_bound(values[positive], weights1[positive], capacity1),
+        _fractional_knapsack_bound(values[positive], weights2[positive], capacity2),
+    )
+
+def _fractional_knapsack_bound(values, weights, capacity):
+    order = np.argsort(-(values / (weights + 1e-12)), kind="stable")
+    values = values[order]
+    weights = weights[order]
+    cumulative = np.cumsum(weights)
+    k = int(np.searchsorted(cumulative, capacity, side="right"))
+    bound = float(values[:k].sum())
+    if k < len(values):
+        remaining = capacity - (cumulative[k - 1] if k else 0)
+        bound += remaining / weights[k] * values[k]
+    return bound
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, nogil=True)
+    def packet_distributions_numba(buf, offsets):
+        """
+        JIT-compiled fused histogram and entropy kernel over the concatenated packet bytes buf,
+        where packet i occupies buf[offsets[i]:offsets[i + 1]].
+        Each packet is scanned once into a local 256-bin histogram, which is then turned into its row of the
+        (W, 256) float32 probability matrix and its entropy in bits (accumulated in float64).
+        Empty packets are left with an all-zero distribution and zero entropy.
+        """
+        W = offsets.shape[0] - 1
+        P = np.zeros((W, 256), dtype=np.float32)
+        entropies = np.zeros(W)
+        for i in range(W):
+            start = offsets[i]
+            end = offsets[i + 1]
+            if end == start:
+                continue
+            counts = np.zeros(256, dtype=np.int64)
+            for j in range(start, end):
+                counts[buf[j]] += 1
+            inv_total = 1.0 / (end - start)
+            entropy = 0.0
+            for b in range(256):
+                if counts[b] > 0:
+                    p = counts[b] * inv_total
+                    P[i, b] = p
+                    entropy -= p * np.log2(p)
+            entropies[i] = entropy
+        return P, entropies
+
+    @njit(cache=True, nogil=True)
+    def knapsack_2d_numba(values, weights1, weights2, capacity1, capacity2):
+        """
+        JIT-compiled two-dimensional 0-1 knapsack with the same semantics as knapsack_2d_numpy.
+        A single (capacity1 + 1, capacity2 + 1) DP plane is updated in place, iterating both capacities
+        in reverse so that each state only reads values from before the current item.
+        Take decisions are bit-packed along capacity2 (bit c2 % 8 of byte c2 // 8) for backtracking.
+        """
+        n = values.shape[0]
+        DP = np.zeros((capacity1 + 1, capacity2 + 1))
+        keep = np.zeros((n, capacity1 + 1, (capacity2 + 8) // 8), dtype=np.uint8)
+        for i in range(n):
+            value = values[i]
+            w = weights1[i]
+            e = weights2[i]
+            for c1 in range(capacity1, w - 1, -1):
+                for c2 in range(capacity2, e - 1, -1):
+                    candidate = DP[c1 - w, c2 - e] + value
+                    if candidate > DP[c1, c2]:
+                        DP[c1, c2] = candidate
+                        keep[i, c1, c2 >> 3] |= np.uint8(1 << (c2 & 7))
+        selected = np.empty(n, dtype=np.int64)
+        count = 0
+        c1 = capacity1
+        c2 = capacity2
+        for i in range(n - 1, -1, -1):
+            if (keep[i, c1, c2 >> 3] >> (c2 & 7)) & 1:
+                selected[count] = i
+                count += 1
+                c1 -= weights1[i]
+                c2 -= weights2[i]
+        return selected[:count][::-1].copy()
+
 class FogNode:
-    def __init__(self, cloud_host, cloud_port, window_size=100):
+    def __init__(self, cloud_host, cloud_port, window_size=100, send_encoded_data=True):
         self.cloud_host = cloud_host
         self.cloud_port = cloud_port
         self.window_size = window_size
+        # The cloud node only consumes the info; set to False to send an empty encoded data section
+        self.send_encoded_data = send_encoded_data
         self.sliding_window = []
-        self.lock = threading.Lock()
-        self.entropy_history = []  
+        # Windows are processed one at a time, in arrival order, off the event loop; the AR(3) entropy history
+        # lives on this instance, so a single worker thread is used rather than a process pool. The NumPy and
+        # numba kernels release the GIL, so receiving continues while a window is processed.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="FogWindow")
+        # Persistent connection to the cloud node, opened on first use and reopened only after a failure
+        self._cloud_sock = None
+        self._cloud_lock = threading.Lock()
+        # Only the last three window entropies are needed by the AR(3) model, so the history is bounded
+        self.entropy_history = deque(maxlen=3)
         self.ar_params = [0.5, 0.3, 0.2]  
         self.ar_const = 0.1             
         self.ar_a = 0.9  
@@ -59,36 +251,34 @@ class FogNode:
         self.gamma2 = 0.5
         self.bandwidth_capacity = 60
         self.energy_capacity = 60
+        # The greedy schedule is accepted when provably within this relative gap of the optimum; 0 always runs the exact DP
+        self.knapsack_tolerance = 0.02
         self.base_bandwidth = 1.0
         self.base_energy = 1.0
+        self.rng = np.random.default_rng()
         
         logging.info(f"FogNode initialization complete, cloud node address: {cloud_host}:{cloud_port}, window size: {window_size}")
 
 
-    def data_callback(self, data, addr):
+    async def put_packet(self, data, addr):
         """
-        Callback function: Called when a data packet is received, adds the data to the sliding window; if the window is full, starts processing
+        Callback coroutine: Called on the event loop when a data packet is received, adds the data to the sliding window;
+        if the window is full, hands it to the processing executor and keeps receiving.
+        All connections share the event loop thread, so the window needs no lock.
         """
         try:
-            logging.info(f"Received data packet from {addr}, size: {len(data)} bytes")
-            with self.lock:
-                if not data or len(data) == 0:
-                    logging.warning("Received data packet is empty, ignoring")
-                    return
-                logging.info(f"First 20 bytes of the data packet: {data[:20]}")
-                self.sliding_window.append(data)
-                logging.info(f"Current window size: {len(self.sliding_window)}/{self.window_size}")
-                if len(self.sliding_window) >= self.window_size:
-                    logging.info("Window is full, starting data processing...")
-                    window_copy = self.sliding_window.copy()
-                    self.sliding_window = []
-                    processing_thread = threading.Thread(
-                        target=self.process_sliding_window, 
-                        args=(window_copy,)
-                    )
-                    processing_thread.daemon = False
-                    processing_thread.start()
-                    logging.info(f"Starting processing thread: {processing_thread.name}")
+            # Per-packet logging is debug-only and guarded, so nothing is formatted unless it is enabled
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug(f"Received data packet from {addr}, size: {len(data)} bytes")
+            if not data or len(data) == 0:
+                logging.warning("Received data packet is empty, ignoring")
+                return
+            self.sliding_window.append(data)
+            if len(self.sliding_window) >= self.window_size:
+                logging.info("Window is full, starting data processing...")
+                # Hand the full window over to the executor and start a fresh one, instead of copying it
+                window, self.sliding_window = self.sliding_window, []
+                asyncio.get_running_loop().run_in_executor(self.executor, self.process_sliding_window, window)
         except Exception as e:
             logging.error(f"Error occurred during data processing callback: {e}")
             logging.error(traceback.format_exc())
@@ -96,8 +286,10 @@ class FogNode:
     def process_sliding_window(self, packets):
         """
         Process the data packets in the sliding window:
-        1. Construct tensor representation: For each packet, calculate a 256-dimensional probability distribution and replicate it three times to form a (W, 256, 3) tensor.
-        2. Perform HOSVD using Tucker decomposition.
+        1. Construct tensor representation: For each packet, calculate a 256-dimensional probability distribution, forming the (W, 256) matrix
+           that the (W, 256, 3) tensor replicates three times.
+        2. Perform HOSVD using Tucker decomposition on the (W, 256) matrix; the replicated third mode adds no information,
+           so the rank-10 Tucker decomposition is the truncated SVD of the matrix.
         3. Calculate the window entropy (average entropy of each packet).
         4. Use an AR(3) model to predict the next moment's entropy value (falling back to AR(1) if historical data is insufficient).
         5. Select network coding parameters (Ct and dt) based on the entropy value.
@@ -109,42 +301,61 @@ class FogNode:
         try:
             logging.info(f"Starting to process window data: {len(packets)} packets")
             W = len(packets)
-            # 1. Construct tensor: Convert each packet to a 256-dimensional probability distribution, replicate three times to form (W, 256, 3)
-            tensor = np.zeros((W, 256, 3))
-            packet_entropies = []
-            for i, packet in enumerate(packets):
-                try:
-                    data_array = np.frombuffer(packet, dtype=np.uint8)
-                    logging.debug(f"Packet {i}: Data array size {len(data_array)}")
-                    hist, _ = np.histogram(data_array, bins=256, range=(0, 256), density=True)
-                    tensor[i, :, :] = np.tile(hist.reshape(256, 1), (1, 3))
-                    nonzero = hist[hist > 0]
-                    ent = -np.sum(nonzero * np.log2(nonzero))
-                    packet_entropies.append(ent)
-                    logging.debug(f"Packet {i}: Entropy value = {ent:.3f} bits")
-                except Exception as e:
-                    logging.error(f"Error occurred while processing packet {i}: {e}")
-                    logging.error(traceback.format_exc())
-                    packet_entropies.append(5.0)
+            debug_enabled = logging.getLogger().isEnabledFor(logging.DEBUG)
+            # Packet lengths are shared by the entropy kernel, the network coding and the performance metrics
+            lens = np.fromiter((len(p) for p in packets), dtype=np.int64, count=W)
+            # 1. Construct tensor: Convert each packet to a 256-dimensional probability distribution, forming the (W, 256) matrix P.
+            #    The (W, 256, 3) tensor would only replicate P three times, so it is never materialized.
+            #    Probabilities are float32, which halves the memory traffic of the SVD step.
+            if NUMBA_AVAILABLE:
+                offsets = np.zeros(W + 1, dtype=np.int64)
+                np.cumsum(lens, out=offsets[1:])
+                buf = np.frombuffer(b"".join(packets), dtype=np.uint8)
+                P, packet_entropies = packet_distributions_numba(buf, offsets)
+                failed_packets = np.flatnonzero(lens == 0)
+            else:
+                P = np.zeros((W, 256), dtype=np.float32)
+                failed_packets = []
+                for i, packet in enumerate(packets):
+                    try:
+                        data_array = np.frombuffer(packet, dtype=np.uint8)
+                        if debug_enabled:
+                            logging.debug(f"Packet {i}: Data array size {len(data_array)}")
+                        # uint8 values map one-to-one onto the 256 unit-width bins, so counting is enough
+                        counts = np.bincount(data_array, minlength=256)
+                        P[i] = counts / counts.sum()
+                    except Exception as e:
+                        logging.error(f"Error occurred while processing packet {i}: {e}")
+                        logging.error(traceback.format_exc())
+                        P[i] = 0.0
+                        failed_packets.append(i)
+                # Entropy of every packet in a single reduction over the (W, 256) matrix, with 0 * log2(0) taken as 0
+                logP = np.zeros_like(P)
+                np.log2(P, out=logP, where=P > 0)
+                packet_entropies = -(P * logP).sum(axis=1)
+            packet_entropies[failed_packets] = 5.0
+            if debug_enabled:
+                logging.debug(f"Packet entropy values (bits): {np.round(packet_entropies, 3)}")
             
-            # 2. Tucker decomposition (HOSVD)
+            # 2. Tucker decomposition (HOSVD) of P; the third mode of the replicated tensor has rank 1 by construction.
+            #    For a matrix, the rank-r Tucker decomposition is the truncated SVD: factors U_r, V_r and core diag(S_r),
+            #    computed with a randomized range finder so P is only touched by a few thin matrix products.
             try:
-                if TENSORLY_AVAILABLE:
-                    logging.info("Executing Tucker decomposition...")
-                    core, factors = tucker(tensor, rank=[min(W, 10), min(256, 10), 3])
-                    logging.info(f"Tucker decomposition completed, core tensor shape: {core.shape}")
-                else:
-                    logging.warning("Tucker decomposition is unavailable, skipping this step")
-                    core = tensor
+                logging.info("Executing Tucker decomposition...")
+                rank = min(W, 256, 10)
+                U, S, Vt = randomized_svd(P, rank, self.rng)
+                core = np.diag(S)
+                factors = [U, Vt.T]
+                logging.info(f"Tucker decomposition completed, core tensor shape: {core.shape}")
             except Exception as e:
                 logging.error(f"Tucker decomposition failed: {e}")
                 logging.error(traceback.format_exc())
-                core = tensor
+                core = P
     
             # 3. Calculate current window entropy: Take the average of all packet entropies
-            current_entropy = np.mean(packet_entropies)
+            current_entropy = float(np.mean(packet_entropies))
             logging.info(f"Current window entropy: {current_entropy:.3f} bits")
-            # Save current entropy to history list for AR(3) prediction
+            # Save current entropy to the bounded history for AR(3) prediction
             self.entropy_history.append(current_entropy)
             
             # 4. Use AR(3) model to predict the next moment's entropy value, falling back to AR(1) if historical data is insufficient
@@ -166,30 +377,32 @@ class FogNode:
             logging.info(f"Selected coding scheme: {self.coding_scheme}, coding degree dt = {self.coding_degree}")
     
             # 6. Network coding: Group packets by coding degree dt and perform XOR encoding on the packets
-            encoded_packet = self.perform_network_coding(packets, self.coding_degree)
+            encoded_packet = self.perform_network_coding(packets, self.coding_degree, lens)
             logging.info(f"Encoded packet length: {len(encoded_packet)} bytes")
     
             # 7. Scheduling decision: Calculate the priority for each packet and use a multi-dimensional 0-1 knapsack algorithm to select packets for transmission 
-            items = []
-            for i, p in enumerate(packets):
-                ent = packet_entropies[i]
-                bw = self.base_bandwidth * (1 + random.uniform(-0.1, 0.1))
-                energy = self.base_energy * (1 + random.uniform(-0.1, 0.1))
-                value = self.gamma1 * ent - self.gamma2 * energy
-                items.append((value, int(bw * 10), int(energy * 10)))
+            #    The bandwidth and energy perturbations of the whole window are drawn in a single call
+            noise = self.rng.uniform(-0.1, 0.1, size=(W, 2))
+            bw = self.base_bandwidth * (1 + noise[:, 0])
+            energy = self.base_energy * (1 + noise[:, 1])
+            values = self.gamma1 * packet_entropies - self.gamma2 * energy
             capacity_bw = self.bandwidth_capacity * 10
             capacity_energy = self.energy_capacity * 10
-            selected_indices = self.multi_dim_knapsack(items, capacity_bw, capacity_energy)
+            selected_indices = self.multi_dim_knapsack(
+                values, (bw * 10).astype(np.int64), (energy * 10).astype(np.int64), capacity_bw, capacity_energy
+            )
             scheduled_packets = [packets[i] for i in selected_indices]
             logging.info(f"Scheduled {len(scheduled_packets)} packets through the multi-dimensional knapsack algorithm")
     
             # 8. Calculate performance metrics
-            total_mutual_info = sum(packet_entropies)
-            total_bandwidth = sum(len(p) * (1 + random.uniform(-0.1, 0.1)) for p in packets)
-            latencies = [random.uniform(0.01, 0.1) for _ in range(len(packets))]
-            total_latency = sum(latencies)
-            energies = [len(p) * 0.001 * (1 + random.uniform(-0.1, 0.1)) for p in packets]
-            total_energy = sum(energies)
+            total_mutual_info = float(packet_entropies.sum())
+            #    The per-packet bandwidth and energy perturbations are drawn together, as vectors over the packet lengths
+            metric_noise = self.rng.uniform(-0.1, 0.1, size=(W, 2))
+            total_bandwidth = float((lens * (1 + metric_noise[:, 0])).sum())
+            latencies = self.rng.uniform(0.01, 0.1, size=W)
+            total_latency = float(latencies.sum())
+            energies = lens * 0.001 * (1 + metric_noise[:, 1])
+            total_energy = float(energies.sum())
             successful_transmissions = len(packets)
             total_transmissions = len(packets)
             time_steps = len(packets) * 0.5
@@ -213,12 +426,12 @@ class FogNode:
                 "num_scheduled": len(scheduled_packets)
             }
             info.update(performance_info)
-            info_str = json.dumps(info)
-            send_data = encoded_packet + b"||" + info_str.encode()
+            info_bytes = json_dumps(info)
+            payload = encoded_packet if self.send_encoded_data else b""
+            header = FRAME_HEADER.pack(len(info_bytes), len(payload))
             
-            from socket_comm import send_tcp_message
             logging.info(f"Attempting to send processing results to the cloud node: {self.cloud_host}:{self.cloud_port}")
-            response = send_tcp_message(self.cloud_host, self.cloud_port, send_data)
+            response = self._send_to_cloud([header, info_bytes, payload])
             if response:
                 logging.info(f"Cloud node response: {response}")
             else:
@@ -228,6 +441,48 @@ class FogNode:
             logging.error(f"Error occurred during processing of the sliding window: {e}")
             logging.error(traceback.format_exc())
     
+    def _get_cloud_sock(self):
+        """
+        Return the persistent connection to the cloud node, connecting first if there is none.
+        """
+        if self._cloud_sock is None:
+            from socket_comm import connect_tcp
+            self._cloud_sock = connect_tcp(self.cloud_host, self.cloud_port)
+            logging.info(f"Connected to the cloud node: {self.cloud_host}:{self.cloud_port}")
+        return self._cloud_sock
+
+    def _close_cloud_sock(self):
+        if self._cloud_sock is not None:
+            try:
+                self._cloud_sock.close()
+            except OSError:
+                pass
+            self._cloud_sock = None
+
+    def _send_to_cloud(self, buffers):
+        """
+        Send one frame, given as a list of buffers, over the persistent cloud connection and return the response.
+        If the connection turns out to be broken (for example the cloud node restarted), reconnect and retry once.
+        Returns None if sending fails.
+        """
+        from socket_comm import send_tcp_request
+        with self._cloud_lock:
+            for attempt in range(2):
+                try:
+                    return send_tcp_request(self._get_cloud_sock(), buffers)
+                except ConnectionError as e:
+                    self._close_cloud_sock()
+                    if attempt == 0:
+                        logging.warning(f"Connection to the cloud node lost ({e}), reconnecting")
+                        continue
+                    logging.error(f"Error occurred while sending to the cloud node: {e}")
+                except OSError as e:
+                    self._close_cloud_sock()
+                    logging.error(f"Error occurred while sending to the cloud node: {e}")
+                    logging.error(traceback.format_exc())
+                    break
+            return None
+
     def decide_coding_parameters(self, entropy):
         """
         Select coding scheme and coding degree based on the current entropy value:
@@ -245,72 +500,80 @@ class FogNode:
             self.coding_scheme = "RLNC"
             self.coding_degree = 6
 
-    def perform_network_coding(self, packets, dt):
+    def perform_network_coding(self, packets, dt, lens=None):
         """
         Perform XOR encoding on the packets within the window grouped by the coding degree dt.
         If the last group has fewer than dt packets, perform XOR encoding on the remaining data as well.
+        lens, the array of packet lengths, can be passed in when the caller has already computed it.
         Return the concatenated byte string of all group encoding results.
         """
         if not packets:
             return b""
-        encoded_groups = []
-        num_groups = math.ceil(len(packets) / dt)
-        logging.info(f"Executing network coding: {len(packets)} packets divided into {num_groups} groups")
+        W = len(packets)
+        num_groups = math.ceil(W / dt)
+        logging.info(f"Executing network coding: {W} packets divided into {num_groups} groups")
         
-        for i in range(num_groups):
-            group = packets[i * dt : (i + 1) * dt]
-            arrays = [np.frombuffer(p, dtype=np.uint8) for p in group]
-            max_length = max(len(arr) for arr in arrays)
-            padded_arrays = []
-            for arr in arrays:
-                if len(arr) < max_length:
-                    padded = np.zeros(max_length, dtype=np.uint8)
-                    padded[:len(arr)] = arr
-                    padded_arrays.append(padded)
-                else:
-                    padded_arrays.append(arr)
-            encoded = padded_arrays[0].copy()
-            for arr in padded_arrays[1:]:
-                encoded = np.bitwise_xor(encoded, arr)
-            encoded_groups.append(encoded.tobytes())
-            logging.debug(f"Group {i}: Encoded {len(group)} packets, result length {len(encoded.tobytes())} bytes")
+        if lens is None:
+            lens = np.fromiter((len(p) for p in packets), dtype=np.int64, count=W)
+        max_len = int(lens.max())
+        if (lens == max_len).all():
+            # Equal-length packets (the common case) need no padding: one join gives a (W, max_len) view,
+            # the full groups reduce in one call, and a short last group is reduced on its own
+            rows = np.frombuffer(b"".join(packets), dtype=np.uint8).reshape(W, max_len)
+            full = W - W % dt
+            encoded = np.bitwise_xor.reduce(rows[:full].reshape(-1, dt, max_len), axis=1)
+            result = encoded.tobytes()
+            if full < W:
+                result += np.bitwise_xor.reduce(rows[full:], axis=0).tobytes()
+            logging.info(f"All groups encoding completed, total length {len(result)} bytes")
+            return result
         
-        result = b"".join(encoded_groups)
+        # Copy the packets into one zero-padded (num_groups * dt, max_len) matrix; the zero padding, including
+        # the extra rows completing the last group, is XOR-neutral, so each group reduces in a single ufunc call
+        buf = np.zeros((num_groups * dt, max_len), dtype=np.uint8)
+        for i, p in enumerate(packets):
+            buf[i, :lens[i]] = np.frombuffer(p, dtype=np.uint8)
+        encoded = np.bitwise_xor.reduce(buf.reshape(num_groups, dt, max_len), axis=1)
+        
+        # Each group's result is as long as its longest packet; trim the global padding if the lengths differ
+        group_lens = np.zeros(num_groups * dt, dtype=np.int64)
+        group_lens[:W] = lens
+        group_lens = group_lens.reshape(num_groups, dt).max(axis=1)
+        if (group_lens == max_len).all():
+            result = encoded.tobytes()
+        else:
+            result = encoded[np.arange(max_len) < group_lens[:, None]].tobytes()
         logging.info(f"All groups encoding completed, total length {len(result)} bytes")
         return result
 
-    def multi_dim_knapsack(self, items, capacity1, capacity2):
+    def multi_dim_knapsack(self, values, weights1, weights2, capacity1, capacity2):
         """
-        Solve the two-dimensional 0-1 knapsack problem, where items is a list where each element (value, weight1, weight2) is an integer.
-        capacity1 and capacity2 are the two constraint capacities.
-        Return a list of indices of the selected items, implemented using dynamic programming.
+        Solve the two-dimensional 0-1 knapsack problem, where values, weights1 and weights2 are per-item arrays
+        (the weights being integers), and capacity1 and capacity2 are the two constraint capacities.
+        Return a list of indices of the selected items, implemented using dynamic programming
+        (JIT-compiled with numba when available, otherwise vectorized with NumPy).
+        Two cheaper paths come first: if every positive-value item fits, they are all selected (the exact optimum);
+        otherwise a greedy schedule is used when its value is within knapsack_tolerance of an upper bound on the optimum.
         """
-        n = len(items)
+        n = len(values)
         logging.debug(f"Starting to solve the multi-dimensional knapsack problem: {n} items, capacities: ({capacity1}, {capacity2})")
-        DP = [[[0 for _ in range(capacity2 + 1)] for _ in range(capacity1 + 1)] for _ in range(n + 1)]
-        keep = [[[False for _ in range(capacity2 + 1)] for _ in range(capacity1 + 1)] for _ in range(n + 1)]
-        for i in range(1, n + 1):
-            value, w, e = items[i - 1]
-            for c1 in range(capacity1 + 1):
-                for c2 in range(capacity2 + 1):
-                    if w <= c1 and e <= c2:
-                        if DP[i - 1][c1 - w][c2 - e] + value > DP[i - 1][c1][c2]:
-                            DP[i][c1][c2] = DP[i - 1][c1 - w][c2 - e] + value
-                            keep[i][c1][c2] = True
-                        else:
-                            DP[i][c1][c2] = DP[i - 1][c1][c2]
-                    else:
-                        DP[i][c1][c2] = DP[i - 1][c1][c2]
-        selected = []
-        c1 = capacity1
-        c2 = capacity2
-        for i in range(n, 0, -1):
-            if keep[i][c1][c2]:
-                selected.append(i - 1)
-                _, w, e = items[i - 1]
-                c1 -= w
-                c2 -= e
-        selected.reverse()
+        values = np.asarray(values, dtype=np.float64)
+        weights1 = np.asarray(weights1, dtype=np.int64)
+        weights2 = np.asarray(weights2, dtype=np.int64)
+        positive = values > 0
+        if weights1[positive].sum() <= capacity1 and weights2[positive].sum() <= capacity2:
+            logging.debug("All positive-value items fit, skipping the knapsack search")
+            selected = np.flatnonzero(positive)
+        else:
+            selected, greedy_value = knapsack_2d_greedy(values, weights1, weights2, capacity1, capacity2)
+            bound = knapsack_2d_upper_bound(values, weights1, weights2, capacity1, capacity2)
+            if greedy_value >= (1 - self.knapsack_tolerance) * bound:
+                logging.debug(f"Using greedy schedule: value {greedy_value:.3f}, upper bound {bound:.3f}")
+            elif NUMBA_AVAILABLE:
+                selected = knapsack_2d_numba(values, weights1, weights2, capacity1, capacity2)
+            else:
+                selected = knapsack_2d_numpy(values, weights1, weights2, capacity1, capacity2)
+        selected = selected.tolist()
         logging.info(f"Multi-dimensional knapsack problem solved, selected {len(selected)} items")
         return selected
 
@@ -333,16 +596,11 @@ def main():
             return
         
         logging.info(f"Starting TCP server, listening {listen_ip}:{listen_port}...")
-        server_thread = threading.Thread(
-            target=start_tcp_server, 
-            args=(listen_ip, listen_port, fog_node.data_callback)
-        )
-        server_thread.daemon = False
-        server_thread.start()
-        logging.info(f"TCP server thread has been started: {server_thread.name}")
-    
         logging.info("Fog node running, waiting for incoming data...")
-        server_thread.join()
+        asyncio.run(start_tcp_server(listen_ip, listen_port, fog_node.put_packet))
+    
+    except KeyboardInterrupt:
+        logging.info("Received keyboard interrupt, shutting down server...")
     
     except Exception as e:
         logging.error(f"Error occurred during the execution of the main function: {e}")
@@ -1,48 +1,60 @@
 #!/usr/bin/env python3
 
+import asyncio
 import socket
 import logging
+import struct
 import sys
-import threading
 import traceback
 
 logging.basicConfig(
-    level=logging.DEBUG, 
+    level=logging.INFO, 
     format='%(asctime)s [%(levelname)s] [SocketComm] %(message)s',
     handlers=[
         logging.StreamHandler(sys.stdout)
     ]
 )
 
-def handle_client(client_socket, addr, callback):
+# Each IoT packet is framed as [4-byte payload length, network byte order][payload]
+PACKET_HEADER = struct.Struct("!I")
+MAX_PACKET_SIZE = 1 << 20
+CLIENT_TIMEOUT = 10
+SOCKET_BUFFER_SIZE = 1 << 20
+
+def configure_socket(sock):
+    """
+    Disable Nagle's algorithm and enlarge the kernel send and receive buffers of a TCP socket.
+    Accepted connections inherit these options from the listening socket.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+
+async def handle_client(reader, writer, callback):
+    addr = writer.get_extra_info("peername")
     try:
         logging.info(f"Starting to process client connection from {addr}")
-        client_socket.settimeout(10)
-        
-        buffer = bytearray()
         while True:
             try:
-                chunk = client_socket.recv(4096)
-                if not chunk:
-                    logging.info(f"Client {addr} has closed the connection")
+                header = await asyncio.wait_for(reader.readexactly(PACKET_HEADER.size), CLIENT_TIMEOUT)
+                (length,) = PACKET_HEADER.unpack(header)
+                if length > MAX_PACKET_SIZE:
+                    logging.error(f"Packet length {length} from {addr} exceeds the limit of {MAX_PACKET_SIZE} bytes, closing the connection")
                     break
+                payload = await asyncio.wait_for(reader.readexactly(length), CLIENT_TIMEOUT)
                 
-                buffer.extend(chunk)
-                logging.debug(f"Received {len(chunk)} bytes of data from {addr}, current buffer size: {len(buffer)} bytes")
-                
-                if len(buffer) > 0:
-                    # Call callback to process data
-                    callback(bytes(buffer), addr)
-                    # Send acknowledgment response
-                    response = b"Received data successfully"
-                    client_socket.sendall(response)
-                    logging.info(f"Send acknowledgment response to {addr}: {response}")
-                    buffer.clear()
-            except socket.timeout:
+                # Call callback once per complete packet
+                await callback(payload, addr)
+                # Send acknowledgment response
+                writer.write(b"Received data successfully")
+            except asyncio.IncompleteReadError as e:
+                if e.partial:
+                    logging.warning(f"Client {addr} closed the connection in the middle of a packet, discarding {len(e.partial)} bytes")
+                else:
+                    logging.info(f"Client {addr} has closed the connection")
+                break
+            except asyncio.TimeoutError:
                 logging.warning(f"Client {addr} receive timeout")
-                if len(buffer) > 0:
-                    callback(bytes(buffer), addr)
-                    buffer.clear()
                 break
             except Exception as e:
                 logging.error(f"Error occurred while receiving data: {e}")
@@ -52,90 +64,93 @@ def handle_client(client_socket, addr, callback):
         logging.error(f"Error occurred while processing client {addr}: {e}")
         logging.error(traceback.format_exc())
     finally:
-        try:
-            client_socket.close()
-            logging.info(f"Connection with {addr} has been closed")
-        except:
-            pass
+        writer.close()
+        logging.info(f"Connection with {addr} has been closed")
 
-def start_tcp_server(listen_ip, listen_port, callback):
+async def start_tcp_server(listen_ip, listen_port, callback):
+    """
+    Serve IoT device connections on a single asyncio event loop instead of one thread per client.
+    callback is a coroutine function called with (data, addr) once for every complete length-prefixed packet.
+    """
     sock = None
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        configure_socket(sock)
         
         logging.info(f"Attempting to bind TCP server on {listen_ip}:{listen_port}")
         sock.bind((listen_ip, listen_port))
-        
-        sock.listen(10)
+        # The stream buffer limit matches the kernel buffer, so reading a large packet does not pause the transport
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_client(reader, writer, callback),
+            sock=sock, limit=SOCKET_BUFFER_SIZE
+        )
         logging.info(f"TCP server successfully listening on {listen_ip}:{listen_port}")
-        
-        while True:
-            try:
-                client, addr = sock.accept()
-                logging.info(f"Accepting connection from {addr}")
-                
-                client_thread = threading.Thread(
-                    target=handle_client, 
-                    args=(client, addr, callback)
-                )
-                client_thread.daemon = True
-                client_thread.start()
-                logging.debug(f"Started new thread for {addr}: {client_thread.name}")
-            except KeyboardInterrupt:
-                logging.info("Received keyboard interrupt, shutting down server...")
-                break
-            except Exception as e:
-                logging.error(f"Error occurred while accepting connection: {e}")
-                logging.error(traceback.format_exc())
-                continue
     except Exception as e:
         logging.error(f"Failed to start TCP server: {e}")
         logging.error(traceback.format_exc())
         if sock:
             sock.close()
         return
-    finally:
-        if sock:
-            try:
-                sock.close()
-                logging.info("TCP server socket has been closed")
-            except:
-                pass
+    async with server:
+        await server.serve_forever()
+    logging.info("TCP server socket has been closed")
 
-def send_tcp_message(remote_host, remote_port, data):
-    sock = None
+# Responses from the cloud node are framed as [4-byte length, network byte order][response]
+RESPONSE_HEADER = struct.Struct("!I")
+
+def connect_tcp(remote_host, remote_port, timeout=5):
+    """
+    Open a configured, keep-alive TCP connection meant to be reused for many requests.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        
+        configure_socket(sock)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.settimeout(timeout)
         logging.info(f"Attempting to connect to {remote_host}:{remote_port}")
         sock.connect((remote_host, remote_port))
-        
-        sock.sendall(data)
-        logging.info(f"Sent {len(data)} bytes to {remote_host}:{remote_port}")
-        
-        # 等待响应
-        response = sock.recv(4096)
-        logging.info(f"Received response from {remote_host}:{remote_port}: {len(response)} bytes")
-        return response
-    except Exception as e:
-        logging.error(f"Error occurred while sending TCP message: {e}")
-        logging.error(traceback.format_exc())
-        return None
-    finally:
-        if sock:
-            try:
-                sock.close()
-                logging.info(f"Connection with {remote_host}:{remote_port} has been closed")
-            except:
-                pass
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+def recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    received = 0
+    while received < n:
+        nbytes = sock.recv_into(view[received:])
+        if nbytes == 0:
+            raise ConnectionError("Connection closed by the peer")
+        received += nbytes
+    return bytes(buf)
+
+def send_tcp_request(sock, buffers):
+    """
+    Send the concatenation of buffers with scatter-gather sendmsg, without joining them first,
+    then wait for the length-prefixed response and return it.
+    Raises OSError (ConnectionError if the peer has gone away) on failure.
+    """
+    views = [memoryview(b).cast("B") for b in buffers if len(b)]
+    while views:
+        sent = sock.sendmsg(views)
+        while views and sent >= len(views[0]):
+            sent -= len(views[0])
+            views.pop(0)
+        if views:
+            views[0] = views[0][sent:]
+    (length,) = RESPONSE_HEADER.unpack(recv_exact(sock, RESPONSE_HEADER.size))
+    return recv_exact(sock, length)
 
 # When this script is run directly, start a simple echo server for testing
 if __name__ == "__main__":
-    def echo_callback(data, addr):
+    async def echo_callback(data, addr):
         logging.info(f"Received {len(data)} bytes of data from {addr}")
         logging.debug(f"First 20 bytes of data: {data[:20]}")
     
     logging.info("Starting test TCP echo server...")
-    start_tcp_server("0.0.0.0", 6000, echo_callback)
+    try:
+        asyncio.run(start_tcp_server("0.0.0.0", 6000, echo_callback))
+    except KeyboardInterrupt:
+        logging.info("Received keyboard interrupt, shutting down server...")
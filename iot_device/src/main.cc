@@ -186,14 +186,19 @@ void IoTDataApp::SendPacket(void) {
                 << " attempting to send packet " << (m_packetsSent + 1)
                 << " with simulated entropy: " << entropy);
     
-    uint8_t *packet_data = new uint8_t[m_packetSize];
+    // frame = [4-byte payload length, network byte order][payload], so the fog node reads exactly one packet
+    const size_t frameSize = sizeof(uint32_t) + m_packetSize;
+    uint8_t *frame = new uint8_t[frameSize];
+    uint32_t length = htonl(m_packetSize);
+    std::memcpy(frame, &length, sizeof(length));
+    uint8_t *packet_data = frame + sizeof(uint32_t);
     for (uint32_t i = 0; i < m_packetSize; i++) {
       packet_data[i] = rand() % 256;
     }
     
     TcpComm comm;
     if (comm.Connect(m_fogHost, m_fogPort)) {
-      ssize_t sent = comm.Send(packet_data, m_packetSize);
+      ssize_t sent = comm.Send(frame, frameSize);
       if (sent > 0) {
         m_packetsSent++;
         NS_LOG_INFO("Node " << GetNode()->GetId() 
@@ -205,7 +210,7 @@ void IoTDataApp::SendPacket(void) {
                   << " failed to connect to " << m_fogHost << ":" << m_fogPort);
     }
     
-    delete[] packet_data;
+    delete[] frame;
     
     // schedule the next sending
     m_sendEvent = Simulator::Schedule(m_interval, &IoTDataApp::SendPacket, this);